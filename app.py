@@ -1,15 +1,34 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, has_request_context
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import re
+import os
+import sys
+import io
+import json
+import math
+import time
+import random
+import cProfile
+import pstats
+import logging
+import logging.handlers
+import bisect
+import functools
+import uuid
+import threading
 import statistics as stats_lib
+from collections import deque, OrderedDict, Counter
 
 from sympy import (
     symbols, sympify, solve, simplify, diff, integrate,
     trigsimp, series, Matrix, latex, factor, expand,
     sin, cos, tan, pi, E, sqrt, log, Abs,
-    limit, oo, Rational
+    limit, oo, Rational, Integral, Poly, preorder_traversal, exp, Add, Mul, S, nsolve, factor_list, Float, I
 )
+from sympy.integrals.rationaltools import ratint
 from sympy.parsing.sympy_parser import parse_expr, standard_transformations, implicit_multiplication_application
+import numpy as np
 import scipy.stats as sci_stats
 
 app = Flask(__name__, static_url_path='', static_folder='.')
@@ -18,36 +37,441 @@ CORS(app)
 x, y, z, n, a, b, t = symbols('x y z n a b t')
 TRANSFORMS = (standard_transformations + (implicit_multiplication_application,))
 
+# ─────────────────────────────────────────────────────────────
+# REQUEST TRACING & SLOW-QUERY LOG (opt-in via SLOW_QUERY_LOG)
+# ─────────────────────────────────────────────────────────────
+
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG')
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 500))
+SLOW_QUERY_PROFILE_RATE = float(os.environ.get('SLOW_QUERY_PROFILE_RATE', 0))
+SLOW_QUERY_PROFILER = os.environ.get('SLOW_QUERY_PROFILER', 'sample')
+SLOW_QUERY_MAX_BYTES = int(os.environ.get('SLOW_QUERY_MAX_BYTES', 5 * 1024 * 1024))
+SLOW_QUERY_BACKUPS = int(os.environ.get('SLOW_QUERY_BACKUPS', 5))
+# Request bodies above this size are left out of the record (only their size is kept), so one large stat
+# upload cannot push the rest of the history out of a rotation file.
+SLOW_QUERY_BODY_MAX_BYTES = int(os.environ.get('SLOW_QUERY_BODY_MAX_BYTES', 16 * 1024))
+
+_trace = threading.local()
+_slow_logger = None
+_slow_logger_lock = threading.Lock()
+
+def _get_slow_logger():
+    global _slow_logger
+    if _slow_logger is not None:
+        return _slow_logger
+    with _slow_logger_lock:
+        if _slow_logger is not None:
+            return _slow_logger
+        logger = logging.getLogger('slow_query')
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        handler = logging.handlers.RotatingFileHandler(
+            SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_MAX_BYTES, backupCount=SLOW_QUERY_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        _slow_logger = logger
+        return _slow_logger
+
+class StackSampler:
+    # Statistical profiler: samples one thread's stack and counts folded "root;...;leaf" lines.
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+
+def traced_engine(fn):
+    # Records the outermost engine a request hits and how long it spent there.
+    name = fn.__name__.replace('engine_', '', 1)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        trace = getattr(_trace, 'current', None)
+        if trace is None or trace['depth']:
+            return fn(*args, **kwargs)
+        trace['engine'] = trace['engine'] or name
+        trace['depth'] += 1
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            trace['engine_s'] += time.perf_counter() - start
+            trace['depth'] -= 1
+    return wrapper
+
+def request_id():
+    # Per-request id shared by the slow-query and complexity logs so their records can be joined.
+    if not has_request_context():
+        return None
+    if 'request_id' not in g:
+        g.request_id = uuid.uuid4().hex[:16]
+    return g.request_id
+
+def traced_route(fn):
+    # Times a request and appends it to the slow-query log when it exceeds SLOW_QUERY_MS. Time spent
+    # waiting in the admission queue (g.admission_wait_s, set by admission_controlled) counts towards it.
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not SLOW_QUERY_LOG:
+            return fn(*args, **kwargs)
+        _trace.current = {'engine': None, 'depth': 0, 'engine_s': 0.0, 'parse_s': 0.0}
+        sampled = random.random() < SLOW_QUERY_PROFILE_RATE
+        profiler = sampler = None
+        if sampled and SLOW_QUERY_PROFILER == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif sampled:
+            sampler = StackSampler(threading.get_ident()).start()
+        start = time.perf_counter()
+        try:
+            response = fn(*args, **kwargs)
+        finally:
+            total = time.perf_counter() - start
+            if profiler:
+                profiler.disable()
+            flame = sampler.stop() if sampler else None
+            trace = _trace.current
+            _trace.current = None
+        queued = g.get('admission_wait_s', 0.0)
+        if (queued + total) * 1000 < SLOW_QUERY_MS:
+            return response
+        body = request.get_json(silent=True) or {}
+        body_json = json.dumps(body, ensure_ascii=False)
+        body_bytes = len(body_json.encode('utf-8'))
+        query = body.get('message') or body.get('equation') or body.get('query') or body_json
+        compute = trace['engine_s'] - trace['parse_s']
+        record = {
+            "ts": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "request_id": request_id(),
+            "endpoint": request.path,
+            "query": query[:500],
+            "body": body if body_bytes <= SLOW_QUERY_BODY_MAX_BYTES else None,
+            "body_bytes": body_bytes,
+            "engine": trace['engine'] or 'none',
+            "parse_ms": round(trace['parse_s'] * 1000, 2),
+            "compute_ms": round(compute * 1000, 2),
+            "format_ms": round((total - trace['engine_s']) * 1000, 2),
+            "queue_ms": round(queued * 1000, 2),
+            "total_ms": round((queued + total) * 1000, 2),
+            "result_bytes": len(response.get_data()) if hasattr(response, 'get_data') else None,
+        }
+        if profiler:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(25)
+            record["profile"] = out.getvalue()
+        if flame is not None:
+            record["flame"] = flame
+        _get_slow_logger().info(json.dumps(record, ensure_ascii=False))
+        return response
+    return wrapper
+
 def safe_parse(expr_str):
     expr_str = expr_str.replace('^', '**')
-    return parse_expr(expr_str, transformations=TRANSFORMS)
+    trace = getattr(_trace, 'current', None)
+    if trace is None:
+        return parse_expr(expr_str, transformations=TRANSFORMS)
+    start = time.perf_counter()
+    try:
+        return parse_expr(expr_str, transformations=TRANSFORMS)
+    finally:
+        trace['parse_s'] += time.perf_counter() - start
+
+# ─────────────────────────────────────────────────────────────
+# EXPRESSION COMPLEXITY ESTIMATOR
+# ─────────────────────────────────────────────────────────────
+
+# Per-operation limits, calibrated against measured SymPy run times (about a 2 s budget for the exact path).
+# Above an operation's limits it switches to its cheap strategy; above the hard 'max' limits it is rejected.
+# Polynomials are held to 'poly_degree' instead of 'degree' (Poly and numpy.roots cope with any sparse degree;
+# a dense (x+1)**3000 takes ~4 s just to expand), and monomials and binomials are never rejected for degree.
+# Override with COMPLEXITY_<OP>_<METRIC>, e.g. COMPLEXITY_SOLVE_DEGREE=16 or COMPLEXITY_MAX_NODES=800.
+_COMPLEXITY_DEFAULTS = {
+    'integrate': {'nodes': 150, 'degree': 120, 'depth': 8},
+    'solve': {'nodes': 80, 'degree': 20, 'depth': 8},  # its steps run simplify(), hence simplify's node limit
+    'simplify': {'nodes': 80, 'degree': 120, 'depth': 8},
+    'max': {'nodes': 600, 'degree': 200, 'depth': 25, 'poly_degree': 3000},
+}
+COMPLEXITY_LIMITS = {
+    op: {metric: int(os.environ.get(f'COMPLEXITY_{op.upper()}_{metric.upper()}', default))
+         for metric, default in limits.items()}
+    for op, limits in _COMPLEXITY_DEFAULTS.items()
+}
+COMPLEXITY_LOG = os.environ.get('COMPLEXITY_LOG')
+COMPLEXITY_MAX_BYTES = int(os.environ.get('COMPLEXITY_MAX_BYTES', 5 * 1024 * 1024))
+COMPLEXITY_BACKUPS = int(os.environ.get('COMPLEXITY_BACKUPS', 5))
+
+_complexity_logger = None
+_complexity_logger_lock = threading.Lock()
+
+def _get_complexity_logger():
+    global _complexity_logger
+    if _complexity_logger is not None:
+        return _complexity_logger
+    with _complexity_logger_lock:
+        if _complexity_logger is not None:
+            return _complexity_logger
+        logger = logging.getLogger('complexity')
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        handler = logging.handlers.RotatingFileHandler(
+            COMPLEXITY_LOG, maxBytes=COMPLEXITY_MAX_BYTES, backupCount=COMPLEXITY_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        _complexity_logger = logger
+        return _complexity_logger
+
+def _degree(expr):
+    # Total polynomial degree, estimated structurally so huge powers are never expanded.
+    if expr.is_Symbol:
+        return 1
+    if expr.is_Number or not expr.args:
+        return 0
+    if expr.is_Add:
+        return max(_degree(arg) for arg in expr.args)
+    if expr.is_Mul:
+        return sum(_degree(arg) for arg in expr.args)
+    if expr.is_Pow and expr.exp.is_Number:
+        return int(abs(expr.exp) * _degree(expr.base)) if expr.exp.is_Rational else _degree(expr.base)
+    return max(_degree(arg) for arg in expr.args)
+
+def _depth(expr):
+    return 1 + max((_depth(arg) for arg in expr.args), default=0)
+
+def expression_metrics(expr):
+    return {
+        "nodes": sum(1 for _ in preorder_traversal(expr)),
+        "degree": _degree(expr),
+        "depth": _depth(expr),
+    }
+
+def _exceeds(m, limits):
+    return any(m[metric] > limits[metric] for metric in limits)
+
+def _is_monomial(term, sym):
+    _, rest = term.as_independent(sym, as_Add=False)
+    return rest == 1 or rest == sym or (rest.is_Pow and rest.base == sym and rest.exp.is_Integer and rest.exp > 0)
+
+def _is_binomial(expr, sym):
+    # a*x**n + b, checked structurally so (x+1)**1000 is never expanded. solve() goes through roots of unity,
+    # so any degree is quick (x**80 - 2 takes ~0.6 s, x**300 - 1 ~1.7 s); integrate and simplify are instant.
+    terms = Add.make_args(expr)
+    return len(terms) <= 2 and all(_is_monomial(term, sym) for term in terms)
+
+def _hard_rational_integrand(expr, sym):
+    # integrate() writes the logs over a cubic or quartic factor's roots in radicals, which can take minutes
+    # (1/(x**3 + x + 1) never finished); binomial and quintic-or-higher factors stay quick.
+    for term in Add.make_args(expr):
+        if term.is_polynomial(sym) or not term.is_rational_function(sym):
+            continue
+        _, den = term.as_numer_denom()
+        for base, _ in factor_list(den, sym)[1]:
+            if Poly(base, sym).degree() in (3, 4) and not _is_binomial(base, sym):
+                return True
+    return False
+
+_decision = threading.local()
+
+def complexity_logged(fn):
+    # Logs the decision estimate_complexity() made inside `fn` together with what it cost: the time from the
+    # decision to the engine's return, whether the engine had to fall back, and whether it ended in an error.
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not COMPLEXITY_LOG:
+            return fn(*args, **kwargs)
+        _decision.current = None
+        outcome = 'error'
+        try:
+            result = fn(*args, **kwargs)
+            outcome = 'error' if 'error' in result else 'ok'
+            return result
+        finally:
+            current, _decision.current = _decision.current, None
+            if current is not None:
+                operation, expr_str, plan, started = current
+                _get_complexity_logger().info(json.dumps({
+                    "request_id": request_id(), "op": operation, "expr": expr_str, "decision": plan['decision'],
+                    "nodes": plan['nodes'], "degree": plan['degree'], "depth": plan['depth'],
+                    "fallback": plan.get('fallback'), "outcome": outcome,
+                    "strategy_ms": round((time.perf_counter() - started) * 1000, 2),
+                }))
+    return wrapper
+
+def estimate_complexity(expr, operation, sym=x):
+    # Decides 'exact', 'cheap' or 'reject' for running `operation` on an already parsed expression.
+    m = expression_metrics(expr)
+    hard, lim = COMPLEXITY_LIMITS['max'], COMPLEXITY_LIMITS[operation]
+    polynomial = expr.is_polynomial()
+    max_degree = hard['poly_degree'] if polynomial else hard['degree']
+    over = [f"{m['nodes']} terms/operations (limit {hard['nodes']})" if m['nodes'] > hard['nodes'] else None,
+            f"nesting depth {m['depth']} (limit {hard['depth']})" if m['depth'] > hard['depth'] else None,
+            f"degree {m['degree']} (limit {max_degree}{'' if polynomial else ' outside polynomials'})"
+            if m['degree'] > max_degree else None]
+    over = [reason for reason in over if reason]
+    if m['nodes'] <= lim['nodes'] and _is_binomial(expr, sym):
+        decision = 'exact'
+    elif over:
+        decision = 'reject'
+    elif _exceeds(m, lim):
+        decision = 'cheap'
+    elif operation == 'integrate' and _hard_rational_integrand(expr, sym):
+        decision = 'cheap'
+    else:
+        decision = 'exact'
+    plan = {"decision": decision, "over": over, **m}
+    if COMPLEXITY_LOG:
+        _decision.current = (operation, str(expr)[:300], plan, time.perf_counter())
+    return plan
+
+def complexity_rejection(expr, plan):
+    message = (f"Expression is too complex to handle here: {', '.join(plan['over'])}. "
+               f"Try splitting it into smaller parts or simplifying it first.")
+    return {"error": message, "steps": [f"📌 Expression: {str(expr)[:200]}", f"❌ {message}"]}
 
 # ─────────────────────────────────────────────────────────────
 # MODULE 1: PURE MATHEMATICS ENGINE
 # ─────────────────────────────────────────────────────────────
 
+# Closed-form fast path for the common cases: sums of c*x**p and c*f(k*x) terms are differentiated and
+# integrated by coefficient arithmetic and the rule table below instead of the general diff/integrate.
+# Only single-term results get faster. A sum, polynomials included, is still passed through simplify() so the
+# answer matches the general path, and simplify() is most of its cost: polynomial sums are not sped up.
+CALCULUS_FAST_PATH = os.environ.get('CALCULUS_FAST_PATH', '1') != '0'
+
+# f -> (d/dx f(u), ∫ f(u) du) as functions of u = k*x
+CALCULUS_RULES = {
+    sin: (lambda u: cos(u), lambda u: -cos(u)),
+    cos: (lambda u: -sin(u), lambda u: sin(u)),
+    exp: (lambda u: exp(u), lambda u: exp(u)),
+}
+
+def _split_term(term, sym):
+    # c*x**p -> (c, None, p); c*f(k*x) -> (c, f, k) for rational c, p, k; anything else -> None
+    coeff, base = term.as_coeff_Mul()
+    if not coeff.is_Rational:
+        return None
+    if base == 1:
+        return coeff, None, S.Zero
+    if base == sym:
+        return coeff, None, S.One
+    if base.is_Pow and base.base == sym and base.exp.is_Rational:
+        return coeff, None, base.exp
+    if type(base) in CALCULUS_RULES:
+        k, arg = base.args[0].as_coeff_Mul()
+        if arg == sym and k.is_Rational and k != 0:
+            return coeff, type(base), k
+    return None
+
+def _split_terms(expr, sym):
+    terms = [_split_term(term, sym) for term in Add.make_args(expr)]
+    return None if any(term is None for term in terms) else terms
+
+def fast_derivative(expr, sym):
+    terms = _split_terms(expr, sym)
+    if terms is None:
+        return None
+    out = []
+    for c, func, k in terms:
+        if func is None:
+            out.append(c * k * sym ** (k - 1))
+        else:
+            out.append(c * k * CALCULUS_RULES[func][0](k * sym))
+    return Add(*out)
+
+def fast_antiderivative(expr, sym):
+    terms = _split_terms(expr, sym)
+    if terms is None:
+        return None
+    out = []
+    for c, func, k in terms:
+        if func is None:
+            out.append(c * log(sym) if k == -1 else c * sym ** (k + 1) / (k + 1))
+        else:
+            out.append(c * CALCULUS_RULES[func][1](k * sym) / k)
+    return Add(*out)
+
+# Per-process simplify() cache size; 0 turns it off (loadtest.py does, unless told to keep it).
+SIMPLIFY_CACHE_SIZE = int(os.environ.get('SIMPLIFY_CACHE_SIZE', 1024))
+
+@functools.lru_cache(maxsize=SIMPLIFY_CACHE_SIZE)
+def simplify_cached(expr):
+    return simplify(expr)
+
+def simplify_bounded(expr):
+    # Large results are returned as they are: simplify() alone takes seconds past its own limits.
+    return expr if _exceeds(expression_metrics(expr), COMPLEXITY_LIMITS['simplify']) else simplify_cached(expr)
+
+def simplify_fast_result(expr):
+    # A single c*x**p, c*log(x) or c*f(k*x) term is already in the form simplify() returns. A sum is not:
+    # simplify() turns 2*x**6/3 - x**3 + 7*x into x*(2*x**5/3 - x**2 + 7), and no cheap normal form matches it.
+    return simplify_bounded(expr) if expr.is_Add else expr
+
+@traced_engine
 def engine_differentiate(expr_str, var_str='x'):
     sym = symbols(var_str)
     expr = safe_parse(expr_str)
-    result = diff(expr, sym)
+    result = fast_derivative(expr, sym) if CALCULUS_FAST_PATH else None
+    if result is not None:
+        simplified = simplify_fast_result(result)
+    else:
+        result = diff(expr, sym)
+        simplified = simplify_bounded(result)
     steps = [
         f"📌 Expression: f({var_str}) = {expr}",
         f"📐 Applying differentiation rules to each term...",
         f"✅ d/d{var_str} [{expr}] = {result}",
-        f"📝 Simplified: {simplify(result)}"
+        f"📝 Simplified: {simplified}"
     ]
-    return {"answer": str(simplify(result)), "steps": steps}
+    return {"answer": str(simplified), "steps": steps}
 
+@traced_engine
+@complexity_logged
 def engine_integrate(expr_str, var_str='x', lower=None, upper=None):
     sym = symbols(var_str)
     expr = safe_parse(expr_str)
+    # The fast path is linear in the number of terms and its result is only simplified within simplify's
+    # limits, so it needs no complexity estimate: x^1000 is answered here whatever its degree.
+    if lower is None and upper is None and CALCULUS_FAST_PATH:
+        result = fast_antiderivative(expr, sym)
+        if result is not None:
+            steps = [
+                f"📌 Expression: f({var_str}) = {expr}",
+                f"📐 Applying integration rules to each term...",
+                f"✅ ∫ [{expr}] d{var_str} = {result} + C",
+            ]
+            return {"answer": str(simplify_fast_result(result)), "steps": steps}
+    plan = estimate_complexity(expr, 'integrate', sym)
+    if plan['decision'] == 'reject':
+        return complexity_rejection(expr, plan)
+    if plan['decision'] == 'cheap':
+        return _integrate_cheap(expr, sym, var_str, lower, upper, plan)
     if lower is not None and upper is not None:
         result = integrate(expr, (sym, lower, upper))
         steps = [
             f"📌 Expression: f({var_str}) = {expr}",
             f"📐 Computing definite integral from {lower} to {upper}...",
             f"∫ [{expr}] d{var_str} from {lower} to {upper}",
-            f"✅ Result = {simplify(result)}"
+            f"✅ Result = {simplify_bounded(result)}"
         ]
     else:
         result = integrate(expr, sym)
@@ -56,8 +480,81 @@ def engine_integrate(expr_str, var_str='x', lower=None, upper=None):
             f"📐 Applying integration rules to each term...",
             f"✅ ∫ [{expr}] d{var_str} = {result} + C",
         ]
-    return {"answer": str(simplify(result)), "steps": steps}
+    return {"answer": str(simplify_bounded(result)), "steps": steps}
+
+def _antiderivative_cheap(coeff, rest, sym):
+    # ∫ coeff*rest for a polynomial coeff: polynomials through Poly, rational functions through ratint with
+    # complex logs (skipping the radical root formulas), anything else only when `rest` is within the exact
+    # limits on its own. None when none of these applies.
+    term = coeff * rest
+    if rest == 1:
+        return Poly(coeff, sym).integrate().as_expr()
+    if term.is_rational_function(sym):
+        return ratint(term, sym, real=False)
+    lim = COMPLEXITY_LIMITS['integrate']
+    if _exceeds(expression_metrics(rest), lim) or Poly(coeff, sym).degree() > lim['degree']:
+        return None
+    result = integrate(term, sym)
+    return None if result.has(Integral) else result
+
+def _integrate_cheap(expr, sym, var_str, lower, upper, plan):
+    steps = [f"📌 Expression: f({var_str}) = {expr}",
+             f"⚡ Large expression ({plan['nodes']} nodes, degree {plan['degree']}) — using a faster method"]
+    if lower is not None and upper is not None:
+        result = Integral(expr, (sym, lower, upper)).evalf()
+        steps += [f"📐 Numerical integration from {lower} to {upper}...", f"✅ Result ≈ {result}"]
+        return {"answer": str(result), "steps": steps}
+    # Terms sharing a non-polynomial factor are integrated together: one ∫ p(x)*sin(2x) instead of one per power.
+    groups = {}
+    for term in Add.make_args(expr):
+        factors = Mul.make_args(term)
+        rest = Mul(*[f for f in factors if not f.is_polynomial(sym)])
+        groups[rest] = groups.get(rest, S.Zero) + Mul(*[f for f in factors if f.is_polynomial(sym)])
+    parts = [_antiderivative_cheap(coeff, rest, sym) for rest, coeff in groups.items()]
+    if any(part is None for part in parts):
+        message = ("Too complex for an exact antiderivative here; give limits "
+                   "(e.g. 'integrate ... from 0 to 1') for a numeric answer.")
+        return {"error": message, "steps": steps + [f"❌ {message}"]}
+    result = Add(*parts)
+    steps += [f"📐 Integrating term by term...", f"✅ ∫ [{expr}] d{var_str} = {result} + C"]
+    return {"answer": str(result), "steps": steps}
+
+def _polynomial_roots(expr, sym):
+    # Companion-matrix eigenvalues: milliseconds at degree 150, where Poly.nroots() ran for minutes and failed.
+    # Raises OverflowError for coefficients beyond float range, e.g. the binomial coefficients of (x+1)**1100.
+    coeffs = np.array([complex(c) for c in Poly(expr, sym).all_coeffs()])
+    if not np.isfinite(coeffs).all():
+        raise OverflowError("polynomial coefficients out of float range")
+    roots = np.roots(coeffs)
+    out = [Float(r.real) if abs(r.imag) <= 1e-10 * max(1.0, abs(r)) else Float(r.real) + Float(r.imag) * I
+           for r in roots]
+    return sorted(out, key=lambda r: (not r.is_real, *(float(part) for part in r.as_real_imag())))
+
+# Starting points for the numeric root search used when solve() has no closed form.
+NSOLVE_GUESSES = (-10, -3, -1, 0, 1, 3, 10)
+
+def _nsolve_roots(expr, sym):
+    roots = []
+    for guess in NSOLVE_GUESSES:
+        try:
+            root = nsolve(expr, sym, guess)
+        except (ValueError, TypeError, ZeroDivisionError):
+            continue
+        if root.is_real and all(abs(root - other) > 1e-9 for other in roots):
+            roots.append(root)
+    return sorted(roots)
 
+def _solve_numeric(expr, equation_str, reason):
+    steps = [f"📌 Equation: {equation_str}", f"⚡ {reason} — searching for real roots numerically"]
+    roots = _nsolve_roots(expr, x)
+    if not roots:
+        message = f"No real roots found near x = {', '.join(map(str, NSOLVE_GUESSES))}."
+        return {"error": message, "steps": steps + [f"❌ {message}"]}
+    steps.append(f"✅ x ≈ {roots}")
+    return {"answer": str(roots), "steps": steps}
+
+@traced_engine
+@complexity_logged
 def engine_solve_equation(equation_str):
     try:
         if '=' in equation_str:
@@ -67,7 +564,37 @@ def engine_solve_equation(equation_str):
             expr = lhs - rhs
         else:
             expr = safe_parse(equation_str)
-        result = solve(expr, x)
+        plan = estimate_complexity(expr, 'solve')
+        if plan['decision'] == 'reject':
+            return complexity_rejection(expr, plan)
+        if plan['decision'] == 'cheap':
+            others = expr.free_symbols - {x}
+            if others:
+                names = ', '.join(sorted(map(str, others)))
+                message = (f"This equation is too large to solve exactly (degree {plan['degree']}), and numeric "
+                           f"root finding needs numbers for {names}. Substitute values for {names}, or keep the "
+                           f"degree at {COMPLEXITY_LIMITS['solve']['degree']} or below.")
+                return {"error": message, "steps": [f"📌 Equation: {equation_str}", f"❌ {message}"]}
+            if not expr.is_polynomial(x):
+                return _solve_numeric(expr, equation_str, "Large equation")
+            try:
+                result = _polynomial_roots(expr, x)
+            except OverflowError:
+                message = "The coefficients are too large for numeric root finding; try factoring the equation first."
+                return {"error": message, "steps": [f"📌 Equation: {equation_str}", f"❌ {message}"]}
+            steps = [
+                f"📌 Equation: {equation_str}",
+                f"⚡ Degree-{plan['degree']} polynomial — finding roots numerically",
+                f"✅ x ≈ {result}"
+            ]
+            return {"answer": str(result), "steps": steps}
+        try:
+            result = solve(expr, x)
+        except NotImplementedError:
+            if expr.free_symbols != {x}:
+                raise
+            plan['fallback'] = 'nsolve'
+            return _solve_numeric(expr, equation_str, "No closed-form solution")
         steps = [
             f"📌 Equation: {equation_str}",
             f"📐 Rearranging to: {simplify(expr)} = 0",
@@ -78,8 +605,21 @@ def engine_solve_equation(equation_str):
     except Exception as e:
         return {"error": str(e), "steps": [f"❌ Could not parse: {equation_str}"]}
 
+@traced_engine
+@complexity_logged
 def engine_simplify(expr_str):
     expr = safe_parse(expr_str)
+    plan = estimate_complexity(expr, 'simplify')
+    if plan['decision'] == 'reject':
+        return complexity_rejection(expr, plan)
+    if plan['decision'] == 'cheap':
+        result = factor(expr) if expr.is_rational_function() else expand(expr)
+        steps = [
+            f"📌 Expression: {expr}",
+            f"⚡ Large expression ({plan['nodes']} nodes) — {'factorising' if expr.is_rational_function() else 'expanding'} instead of a full simplification",
+            f"✅ Simplified: {result}"
+        ]
+        return {"answer": str(result), "steps": steps}
     result = simplify(expr)
     steps = [
         f"📌 Expression: {expr}",
@@ -88,6 +628,7 @@ def engine_simplify(expr_str):
     ]
     return {"answer": str(result), "steps": steps}
 
+@traced_engine
 def engine_factor(expr_str):
     expr = safe_parse(expr_str)
     result = factor(expr)
@@ -106,6 +647,7 @@ def parse_list(query):
     nums = re.findall(r'[-+]?\d*\.?\d+', query)
     return [float(n) for n in nums]
 
+@traced_engine
 def engine_statistics(query, operation):
     data = parse_list(query)
     if not data:
@@ -148,6 +690,288 @@ def engine_statistics(query, operation):
         steps += [f"📐 X: {data[:mid]}", f"📐 Y: {data[mid:]}", f"✅ r = {r:.4f}, p = {p:.4f}"]
     return {"answer": f"{result}", "steps": steps}
 
+# ─────────────────────────────────────────────────────────────
+# MODULE 2b: ROLLING STATISTICS SESSIONS
+# ─────────────────────────────────────────────────────────────
+
+class QuantileSketch:
+    # Merging digest: sorted (mean, weight) centroids, small near the tails, capped by `compression`.
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.centroids = []
+        self.total = 0.0
+
+    def add(self, values):
+        self.centroids.extend((float(v), 1.0) for v in values)
+        self.total += len(values)
+        if len(self.centroids) > 2 * self.compression:
+            self._compress()
+
+    def merge(self, other):
+        self.centroids.extend(other.centroids)
+        self.total += other.total
+        self._compress()
+
+    def _compress(self):
+        if not self.centroids:
+            return
+        cents = sorted(self.centroids)
+        out = [list(cents[0])]
+        cum = 0.0
+        for mean, weight in cents[1:]:
+            cur = out[-1]
+            proposed = cur[1] + weight
+            q = (cum + proposed / 2) / self.total
+            if proposed <= max(1.0, 4 * self.total * q * (1 - q) / self.compression):
+                cur[0] += (mean - cur[0]) * weight / proposed
+                cur[1] = proposed
+            else:
+                cum += cur[1]
+                out.append([mean, weight])
+        self.centroids = [(m, w) for m, w in out]
+
+    def quantile(self, q, lo, hi):
+        if not self.centroids:
+            return None
+        self._compress()
+        target = q * self.total
+        prev_pos, prev_mean = 0.0, lo
+        cum = 0.0
+        for mean, weight in self.centroids:
+            pos = cum + weight / 2
+            if target <= pos:
+                if pos == prev_pos:
+                    return mean
+                return prev_mean + (mean - prev_mean) * (target - prev_pos) / (pos - prev_pos)
+            prev_pos, prev_mean = pos, mean
+            cum += weight
+        if self.total == prev_pos:
+            return hi
+        return prev_mean + (hi - prev_mean) * (target - prev_pos) / (self.total - prev_pos)
+
+    def to_dict(self):
+        self._compress()
+        return {"compression": self.compression, "centroids": [[m, w] for m, w in self.centroids]}
+
+    @classmethod
+    def from_dict(cls, state):
+        if not isinstance(state, dict) or not isinstance(state.get('centroids', []), list):
+            raise ValueError("sketch must be an object with a list of centroids.")
+        compression = _finite(state.get('compression', 100), "compression")
+        if not 1 <= compression <= 1000:
+            raise ValueError("compression must be between 1 and 1000.")
+        if len(state.get('centroids', [])) > STATS_BATCH_MAX:
+            raise ValueError(f"a sketch may hold at most {STATS_BATCH_MAX} centroids.")
+        sketch = cls(compression)
+        for centroid in state.get('centroids', []):
+            if not isinstance(centroid, list) or len(centroid) != 2:
+                raise ValueError("each centroid must be a [mean, weight] pair.")
+            mean, weight = _finite(centroid[0], "centroid mean"), _finite(centroid[1], "centroid weight")
+            if weight <= 0:
+                raise ValueError("centroid weights must be positive.")
+            sketch.centroids.append((mean, weight))
+        sketch.total = sum(w for _, w in sketch.centroids)
+        return sketch
+
+STATS_WINDOW_MAX = 100000
+# Most values one request may add; larger uploads are split across several appends.
+STATS_BATCH_MAX = 10000
+
+def _finite(value, what):
+    # float() accepts bools and strings like "nan"; neither is a usable data point.
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{what} must be a number, got {value!r}.")
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{what} must be a number, got {value!r}.")
+    if not math.isfinite(number):
+        raise ValueError(f"{what} must be finite, got {value!r}.")
+    return number
+
+def parse_window(window):
+    if window is None or window == '':
+        return None
+    size = _finite(window, "window")
+    if not size.is_integer() or not 1 <= size <= STATS_WINDOW_MAX:
+        raise ValueError(f"window must be a whole number between 1 and {STATS_WINDOW_MAX}.")
+    return int(size)
+
+def parse_values(values, limit=STATS_BATCH_MAX):
+    if not isinstance(values, list):
+        raise ValueError("values must be a list of numbers.")
+    if len(values) > limit:
+        raise ValueError(f"at most {limit} values per request, got {len(values)}.")
+    return [_finite(v, "value") for v in values]
+
+def parse_quantile(q):
+    q = _finite(q, "quantile")
+    if not 0 <= q <= 1:
+        raise ValueError(f"quantile must be between 0 and 1, got {q}.")
+    return q
+
+class StatsSession:
+    # Running moments (Welford/Chan) plus a quantile sketch. With `window`, only the last N values count:
+    # they are kept in arrival order and in a sorted list, so each value costs O(log N) to find plus a
+    # C-level list shift of up to N slots, and min/max/quantiles are O(1) reads. Callers hold `lock` around
+    # every use, so one session's work never blocks another's.
+    def __init__(self, window=None, compression=100):
+        self.lock = threading.Lock()
+        self.window = parse_window(window)
+        self.values = deque() if self.window else None
+        self.sorted = [] if self.window else None
+        self.sketch = None if self.window else QuantileSketch(compression)
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def _push(self, v):
+        self.n += 1
+        delta = v - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (v - self.mean)
+
+    def _pop(self, v):
+        if self.n == 1:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        delta = v - self.mean
+        self.mean = (self.n * self.mean - v) / (self.n - 1)
+        self.m2 = max(0.0, self.m2 - delta * (v - self.mean))
+        self.n -= 1
+
+    def append(self, values):
+        values = parse_values(values)
+        for v in values:
+            self._push(v)
+            if self.window:
+                self.values.append(v)
+                bisect.insort(self.sorted, v)
+                if len(self.values) > self.window:
+                    old = self.values.popleft()
+                    del self.sorted[bisect.bisect_left(self.sorted, old)]
+                    self._pop(old)
+        if self.window:
+            self.min = self.sorted[0] if self.sorted else None
+            self.max = self.sorted[-1] if self.sorted else None
+            return
+        self.sketch.add(values)
+        if values:
+            self.min = min(values) if self.min is None else min(self.min, *values)
+            self.max = max(values) if self.max is None else max(self.max, *values)
+
+    def merge(self, other):
+        if self.window or other.window:
+            raise ValueError("Windowed sessions cannot be merged.")
+        if other.n == 0:
+            return self
+        total = self.n + other.n
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.n * other.n / total
+        self.mean += delta * other.n / total
+        self.n = total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def quantile(self, q):
+        q = parse_quantile(q)
+        if self.n == 0:
+            return None
+        if self.window:
+            # Linear interpolation between closest ranks, as np.percentile does by default.
+            k = (len(self.sorted) - 1) * q
+            lo = int(k)
+            hi = min(lo + 1, len(self.sorted) - 1)
+            return self.sorted[lo] + (self.sorted[hi] - self.sorted[lo]) * (k - lo)
+        return self.sketch.quantile(q, self.min, self.max)
+
+    def summary(self, quantiles=(0.25, 0.5, 0.75)):
+        lo, hi = self.min, self.max
+        variance = self.m2 / (self.n - 1) if self.n > 1 else None
+        result = {
+            "n": self.n,
+            "mean": self.mean if self.n else None,
+            "variance": variance,
+            "std": math.sqrt(variance) if variance is not None else None,
+            "min": lo,
+            "max": hi,
+            "range": hi - lo if self.n else None,
+            "quantiles": {str(q): self.quantile(q) for q in quantiles},
+            "window": self.window,
+        }
+        steps = [f"📊 n = {self.n}" + (f" (last {self.window} values)" if self.window else "")]
+        if self.n:
+            steps.append(f"✅ Mean = {self.mean:.4f}")
+        if variance is not None:
+            steps += [f"✅ Variance = {variance:.4f}", f"✅ Standard Deviation = {result['std']:.4f}"]
+        if self.n:
+            steps.append(f"✅ Range = {hi} − {lo} = {result['range']}")
+        result["steps"] = steps
+        return result
+
+    def to_dict(self):
+        state = {"window": self.window, "n": self.n, "mean": self.mean, "m2": self.m2,
+                 "min": self.min, "max": self.max}
+        if self.window:
+            state["values"] = list(self.values)
+        else:
+            state["sketch"] = self.sketch.to_dict()
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        # Validates exported state before trusting it; anything malformed raises ValueError.
+        if not isinstance(state, dict):
+            raise ValueError("state must be an object.")
+        session = cls(window=state.get('window'))
+        if session.window:
+            values = parse_values(state.get('values', []), limit=session.window)
+            if len(values) > session.window:
+                raise ValueError("state holds more values than its window.")
+            session.append(values)
+            return session
+        n = _finite(state.get('n', 0), "n")
+        if not n.is_integer() or n < 0:
+            raise ValueError("n must be a non-negative whole number.")
+        session.n = int(n)
+        session.mean = _finite(state.get('mean', 0.0), "mean")
+        session.m2 = _finite(state.get('m2', 0.0), "m2")
+        if session.m2 < 0:
+            raise ValueError("m2 must not be negative.")
+        session.sketch = QuantileSketch.from_dict(state.get('sketch', {}))
+        if session.n:
+            session.min = _finite(state.get('min'), "min")
+            session.max = _finite(state.get('max'), "max")
+            if session.min > session.max:
+                raise ValueError("min must not exceed max.")
+        if abs(session.sketch.total - session.n) > 1e-6 * max(1, session.n):
+            raise ValueError("sketch weight does not match n.")
+        return session
+
+STATS_SESSIONS = OrderedDict()
+STATS_SESSIONS_MAX = 1000
+STATS_SESSIONS_LOCK = threading.Lock()  # guards the registry only; each session has its own lock
+
+def stats_session_create(window=None):
+    session_id = uuid.uuid4().hex
+    session = StatsSession(window=window)
+    with STATS_SESSIONS_LOCK:
+        STATS_SESSIONS[session_id] = session
+        while len(STATS_SESSIONS) > STATS_SESSIONS_MAX:
+            STATS_SESSIONS.popitem(last=False)
+    return session_id, session
+
+def stats_session_get(session_id):
+    with STATS_SESSIONS_LOCK:
+        session = STATS_SESSIONS.get(session_id)
+        if session is not None:
+            STATS_SESSIONS.move_to_end(session_id)
+        return session
+
 # ─────────────────────────────────────────────────────────────
 # MODULE 3: FUNCTION POINT ANALYSIS ENGINE
 # ─────────────────────────────────────────────────────────────
@@ -160,6 +984,7 @@ FP_WEIGHTS = {
     'EIF': {'low': 5, 'avg': 7,  'high': 10},
 }
 
+@traced_engine
 def engine_function_points(components, vaf_sum=None):
     steps = ["📌 Function Point Analysis (IFPUG Method)"]
     steps.append("\n🔢 Step 1 — Calculate Unadjusted Function Points (UFP):")
@@ -198,6 +1023,7 @@ COCOMO_PARAMS = {
     'embedded':      {'a': 3.6,  'b': 1.20, 'c': 2.5, 'd': 0.32},
 }
 
+@traced_engine
 def engine_cocomo(kloc, mode='organic'):
     mode = mode.lower().strip()
     if mode not in COCOMO_PARAMS:
@@ -222,17 +1048,49 @@ def engine_cocomo(kloc, mode='organic'):
 # INTELLIGENT QUERY ROUTER
 # ─────────────────────────────────────────────────────────────
 
+STAT_OPS = {
+    'mean': 'mean', 'average': 'mean', 'median': 'median', 'mode': 'mode',
+    'variance': 'variance', 'standard deviation': 'std', 'std dev': 'std',
+    'stdev': 'std', 'range': 'range', 'iqr': 'iqr', 'quartile': 'quartile',
+    'correlation': 'correlation', 'pearson': 'correlation'
+}
+
+def query_engine(query):
+    # Which engine route_query will hit, decided from keywords alone (nothing is parsed or computed).
+    q = query.strip()
+    ql = q.lower()
+    if 'cocomo' in ql:
+        return 'cocomo'
+    if 'function point' in ql or ' fp ' in ql or ql.startswith('fp'):
+        return 'function_points'
+    if any(keyword in ql for keyword in STAT_OPS):
+        return 'statistics'
+    if any(k in ql for k in ['differentiate', 'derivative', 'diff ', 'd/dx', "f'("]):
+        return 'differentiate'
+    if any(k in ql for k in ['integrate', 'integral', '∫']):
+        return 'integrate'
+    if any(k in ql for k in ['solve', 'find x', 'find the value']) or '=' in q:
+        return 'solve_equation'
+    if any(k in ql for k in ['factor', 'factorise', 'factorize']):
+        return 'factor'
+    if 'simplify' in ql:
+        return 'simplify'
+    if re.search(r'[\d\+\-\*\/\^\(\)xX]', q):
+        return 'expression'
+    return 'help'
+
 def route_query(query):
     q = query.strip()
     ql = q.lower()
+    engine = query_engine(q)
 
-    if 'cocomo' in ql:
+    if engine == 'cocomo':
         nums = re.findall(r'\d+\.?\d*', q)
         kloc = float(nums[0]) if nums else 10
         mode = 'semi-detached' if 'semi' in ql else ('embedded' if 'embedded' in ql else 'organic')
         return "\n".join(engine_cocomo(kloc, mode)['steps'])
 
-    if 'function point' in ql or ' fp ' in ql or ql.startswith('fp'):
+    if engine == 'function_points':
         components = []
         for ctype in ['EI', 'EO', 'EQ', 'ILF', 'EIF']:
             for m in re.findall(rf'(\d+)\s*{ctype}\s*(low|avg|high)?', q, re.IGNORECASE):
@@ -243,24 +1101,18 @@ def route_query(query):
             return "❓ Try: '3 EI low, 2 ILF avg, 1 EO high, VAF=42'. Components: EI, EO, EQ, ILF, EIF. Complexity: low/avg/high."
         return "\n".join(engine_function_points(components, vaf_sum)['steps'])
 
-    stat_ops = {
-        'mean': 'mean', 'average': 'mean', 'median': 'median', 'mode': 'mode',
-        'variance': 'variance', 'standard deviation': 'std', 'std dev': 'std',
-        'stdev': 'std', 'range': 'range', 'iqr': 'iqr', 'quartile': 'quartile',
-        'correlation': 'correlation', 'pearson': 'correlation'
-    }
-    for keyword, op in stat_ops.items():
-        if keyword in ql:
-            result = engine_statistics(q, op)
-            return "\n".join(result.get('steps', [f"❌ {result.get('error', 'Error')}"]))
+    if engine == 'statistics':
+        op = next(op for keyword, op in STAT_OPS.items() if keyword in ql)
+        result = engine_statistics(q, op)
+        return "\n".join(result.get('steps', [f"❌ {result.get('error', 'Error')}"]))
 
-    if any(k in ql for k in ['differentiate', 'derivative', 'diff ', 'd/dx', "f'("]):
+    if engine == 'differentiate':
         em = re.search(r'(?:differentiate|derivative of|diff)\s+(.+?)(?:\s+with respect to \w+)?$', ql)
         expr_str = em.group(1) if em else q
         vm = re.search(r'with respect to (\w)', ql)
         return "\n".join(engine_differentiate(expr_str.strip(), vm.group(1) if vm else 'x')['steps'])
 
-    if any(k in ql for k in ['integrate', 'integral', '∫']):
+    if engine == 'integrate':
         definite = re.search(r'from\s+(-?\d+\.?\d*)\s+to\s+(-?\d+\.?\d*)', ql)
         em = re.search(r'(?:integrate|integral of)\s+(.+?)(?:\s+from)?', ql)
         expr_str = em.group(1).strip() if em else q
@@ -268,19 +1120,19 @@ def route_query(query):
             return "\n".join(engine_integrate(expr_str, lower=float(definite.group(1)), upper=float(definite.group(2)))['steps'])
         return "\n".join(engine_integrate(expr_str)['steps'])
 
-    if any(k in ql for k in ['solve', 'find x', 'find the value']) or '=' in q:
+    if engine == 'solve_equation':
         expr_str = re.sub(r'^(solve|find x|find the value of x)[:\s]*', '', ql).strip() or q
         return "\n".join(engine_solve_equation(expr_str)['steps'])
 
-    if any(k in ql for k in ['factor', 'factorise', 'factorize']):
+    if engine == 'factor':
         expr_str = re.sub(r'^(factor|factorise|factorize)[:\s]*', '', ql).strip() or q
         return "\n".join(engine_factor(expr_str)['steps'])
 
-    if 'simplify' in ql:
+    if engine == 'simplify':
         expr_str = re.sub(r'^simplify[:\s]*', '', ql).strip() or q
         return "\n".join(engine_simplify(expr_str)['steps'])
 
-    if re.search(r'[\d\+\-\*\/\^\(\)xX]', q):
+    if engine == 'expression':
         try:
             result = engine_solve_equation(q) if '=' in q else engine_simplify(q)
             return "\n".join(result['steps'])
@@ -296,17 +1148,179 @@ def route_query(query):
         "Type any query above to get started!"
     )
 
+# ─────────────────────────────────────────────────────────────
+# ADMISSION CONTROL & RATE LIMITING
+# ─────────────────────────────────────────────────────────────
+
+HEAVY_ENGINES = {'differentiate', 'integrate', 'solve_equation', 'factor', 'simplify', 'expression'}
+
+# Limits are per worker process and only take effect when a worker serves requests concurrently
+# (the Procfile runs gthread workers with 16 threads). Heavy work can hold at most concurrency + queue
+# threads (2 + 8 by default), which leaves the rest of a worker's threads free for light requests.
+ADMISSION_LIMITS = {
+    'heavy': {'concurrency': int(os.environ.get('ADMISSION_HEAVY_CONCURRENCY', 2)),
+              'queue': int(os.environ.get('ADMISSION_HEAVY_QUEUE', 8))},
+    'light': {'concurrency': int(os.environ.get('ADMISSION_LIGHT_CONCURRENCY', 16)),
+              'queue': int(os.environ.get('ADMISSION_LIGHT_QUEUE', 64))},
+}
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 5))
+# Number of trusted reverse proxies in front of the app; X-Forwarded-For is ignored unless this is set.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+# Per-client limits need the real client address. Behind a platform router (as in the Procfile deployment)
+# remote_addr is the router, and every user would share one bucket, so rate limiting is off by default until
+# TRUSTED_PROXY_HOPS is set. Set RATE_LIMIT_PER_SEC explicitly when clients connect directly;
+# RATE_LIMIT_PER_SEC=0 always turns it off.
+RATE_LIMIT_PER_SEC = float(os.environ.get('RATE_LIMIT_PER_SEC', 5 if TRUSTED_PROXY_HOPS else 0))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', 20))
+RATE_LIMIT_COST = {'heavy': float(os.environ.get('RATE_LIMIT_HEAVY_COST', 4)), 'light': 1.0}
+RATE_LIMIT_CLIENTS_MAX = 10000
+
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
+def classify_chat(data):
+    return 'heavy' if query_engine(data.get('message', '')) in HEAVY_ENGINES else 'light'
+
+def classify_solve(data):
+    return 'light' if data.get('mode', 'math') in ('fp', 'cocomo', 'stat') else 'heavy'
+
+def classify_session(data):
+    return 'light'
+
+class AdmissionGate:
+    # Bounded concurrency with a bounded wait queue; callers past the queue are turned away immediately.
+    def __init__(self, concurrency, queue):
+        self.concurrency = concurrency
+        self.queue = queue
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout):
+        with self._cond:
+            if self.active < self.concurrency:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.queue:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            try:
+                if not self._cond.wait_for(lambda: self.active < self.concurrency, timeout):
+                    self.timed_out += 1
+                    return False
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def metrics(self):
+        with self._cond:
+            return {"concurrency": self.concurrency, "queue_limit": self.queue, "active": self.active,
+                    "queue_depth": self.waiting, "admitted": self.admitted,
+                    "rejected": self.rejected, "timed_out": self.timed_out}
+
+class TokenBuckets:
+    # One token bucket per client; heavy requests cost more tokens than light ones.
+    def __init__(self, rate, burst, max_clients=RATE_LIMIT_CLIENTS_MAX):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()
+        self.limited = 0
+        self._lock = threading.Lock()
+
+    def take(self, client, cost):
+        # Returns 0 when admitted, otherwise the seconds until enough tokens are available.
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self.buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / self.rate
+                self.limited += 1
+            self.buckets[client] = (tokens, now)
+            while len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+            return wait
+
+    def refund(self, client, cost):
+        # Gives back tokens for a request that was taken from the bucket but never served.
+        if self.rate <= 0:
+            return
+        with self._lock:
+            if client in self.buckets:
+                tokens, last = self.buckets[client]
+                self.buckets[client] = (min(self.burst, tokens + cost), last)
+
+ADMISSION_GATES = {cls: AdmissionGate(**limits) for cls, limits in ADMISSION_LIMITS.items()}
+RATE_LIMITER = TokenBuckets(RATE_LIMIT_PER_SEC, RATE_LIMIT_BURST)
+
+def _client_id():
+    # remote_addr is the peer address, or the proxied client address when ProxyFix is enabled.
+    return request.remote_addr or 'unknown'
+
+def _rejection(message, status, retry_after):
+    response = jsonify({"error": message, "steps": [f"❌ {message}"]})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+def admission_controlled(classify):
+    # Rate-limits per client, then queues the request behind the concurrency gate for its cost class.
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cost_class = classify(request.get_json(silent=True) or {})
+            client = _client_id()
+            wait = RATE_LIMITER.take(client, RATE_LIMIT_COST[cost_class])
+            if wait:
+                return _rejection("Rate limit exceeded, please slow down.", 429, wait)
+            gate = ADMISSION_GATES[cost_class]
+            queued_at = time.perf_counter()
+            admitted = gate.acquire(ADMISSION_QUEUE_TIMEOUT)
+            g.admission_wait_s = time.perf_counter() - queued_at
+            if not admitted:
+                RATE_LIMITER.refund(client, RATE_LIMIT_COST[cost_class])
+                return _rejection(f"Server busy with {cost_class} requests, please retry shortly.", 503,
+                                  ADMISSION_QUEUE_TIMEOUT)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                gate.release()
+        return wrapper
+    return decorator
+
 @app.route('/')
 def index():
     return app.send_static_file('index.html')
 
 @app.route('/api/chat', methods=['POST'])
+@admission_controlled(classify_chat)
+@traced_route
 def chat():
     data = request.json or {}
     response = route_query(data.get('message', ''))
     return jsonify({"response": response})
 
 @app.route('/api/solve', methods=['POST'])
+@admission_controlled(classify_solve)
+@traced_route
 def api_solve():
     data = request.json or {}
     mode = data.get('mode', 'math')
@@ -320,6 +1334,101 @@ def api_solve():
         result = engine_solve_equation(data.get('equation', ''))
     return jsonify(result)
 
+def _session_values(data):
+    values = data.get('values')
+    if values is None:
+        return parse_values(parse_list(str(data.get('query', ''))))
+    return parse_values(values)
+
+def _session_quantiles():
+    qs = request.args.get('q')
+    if not qs:
+        return (0.25, 0.5, 0.75)
+    return tuple(parse_quantile(q) for q in qs.split(',') if q.strip())
+
+def _session_error(message, status):
+    return jsonify({"error": message, "steps": [f"❌ {message}"]}), status
+
+@app.route('/api/stats/session', methods=['POST'])
+@admission_controlled(classify_session)
+def stats_session_new():
+    data = request.get_json(silent=True) or {}
+    try:
+        window = parse_window(data.get('window'))
+        values = _session_values(data)
+    except ValueError as e:
+        return _session_error(str(e), 400)
+    session_id, session = stats_session_create(window)
+    with session.lock:
+        session.append(values)
+        result = session.summary()
+    return jsonify({"session_id": session_id, **result})
+
+@app.route('/api/stats/session/<session_id>', methods=['GET'])
+@admission_controlled(classify_session)
+def stats_session_query(session_id):
+    session = stats_session_get(session_id)
+    if session is None:
+        return _session_error("Unknown stats session.", 404)
+    try:
+        quantiles = _session_quantiles()
+    except ValueError as e:
+        return _session_error(str(e), 400)
+    with session.lock:
+        result = session.summary(quantiles)
+    return jsonify({"session_id": session_id, **result})
+
+@app.route('/api/stats/session/<session_id>/append', methods=['POST'])
+@admission_controlled(classify_session)
+def stats_session_append(session_id):
+    session = stats_session_get(session_id)
+    if session is None:
+        return _session_error("Unknown stats session.", 404)
+    try:
+        values = _session_values(request.get_json(silent=True) or {})
+        quantiles = _session_quantiles()
+    except ValueError as e:
+        return _session_error(str(e), 400)
+    with session.lock:
+        session.append(values)
+        result = session.summary(quantiles)
+    return jsonify({"session_id": session_id, **result})
+
+@app.route('/api/stats/session/<session_id>/state', methods=['GET'])
+@admission_controlled(classify_session)
+def stats_session_state(session_id):
+    session = stats_session_get(session_id)
+    if session is None:
+        return _session_error("Unknown stats session.", 404)
+    with session.lock:
+        return jsonify(session.to_dict())
+
+@app.route('/api/stats/session/<session_id>/merge', methods=['POST'])
+@admission_controlled(classify_session)
+def stats_session_merge(session_id):
+    session = stats_session_get(session_id)
+    if session is None:
+        return _session_error("Unknown stats session.", 404)
+    data = request.get_json(silent=True) or {}
+    try:
+        other = StatsSession.from_dict(data.get('state', {}))
+        quantiles = _session_quantiles()
+        with session.lock:
+            session.merge(other)
+            result = session.summary(quantiles)
+    except ValueError as e:
+        return _session_error(str(e), 400)
+    return jsonify({"session_id": session_id, **result})
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        "admission": {cls: gate.metrics() for cls, gate in ADMISSION_GATES.items()},
+        "rate_limit": {"clients": len(RATE_LIMITER.buckets), "limited": RATE_LIMITER.limited,
+                       "rate_per_sec": RATE_LIMITER.rate, "burst": RATE_LIMITER.burst,
+                       "trusted_proxy_hops": TRUSTED_PROXY_HOPS},
+    })
+
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({"status": "healthy", "engine": "AI Math Engine v2"})
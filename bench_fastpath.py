@@ -0,0 +1,85 @@
+"""Benchmark the closed-form calculus fast path against the general SymPy path.
+
+    python bench_fastpath.py --repeat 20
+
+Both paths are timed cold (simplify cache cleared before every call, as for a first-seen query) and warm
+(repeated queries hit the cache), and each is only compared with the same mode of the other.
+
+The fast path only pays off when the result is a single term: simplify() is skipped there, and that is where
+the time goes (about 6-15x cold). Polynomial sums such as x^3+2x are not sped up (about 1.0-1.1x cold): their
+result is still passed through simplify(), whose factored forms (x*(2*x**5/3 - x**2 + 7)) no coefficient
+arithmetic reproduces, and warm both paths are mostly cache hits. The exception is an integrand that SymPy's
+own integrate() is slow on, such as exp(3x)-1/x. Every pattern is checked to give the same answer both ways.
+"""
+import argparse
+import time
+
+import app
+
+PATTERNS = [
+    ("differentiate", "x^3"),
+    ("differentiate", "sin(3x)"),
+    ("differentiate", "5exp(2x)"),
+    ("differentiate", "x^3+2x"),
+    ("differentiate", "4x^5-3x^2+7"),
+    ("differentiate", "3cos(2x)+x^2"),
+    ("differentiate", "exp(3x)-1/x"),
+    ("integrate", "x^4"),
+    ("integrate", "sin(x)"),
+    ("integrate", "2cos(3x)"),
+    ("integrate", "x^3+2x"),
+    ("integrate", "4x^5-3x^2+7"),
+    ("integrate", "3cos(2x)+x^2"),
+    ("integrate", "exp(3x)-1/x"),
+    ("integrate", "sqrt(x)+x^-2"),
+]
+
+ENGINES = {"differentiate": app.engine_differentiate, "integrate": app.engine_integrate}
+
+
+def timed(fn, expr, repeat, cold):
+    best = float('inf')
+    fn(expr)
+    for _ in range(repeat):
+        if cold:
+            app.simplify_cached.cache_clear()
+        start = time.perf_counter()
+        result = fn(expr)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(fn, expr, repeat, fast):
+    app.CALCULUS_FAST_PATH = fast
+    cold, result = timed(fn, expr, repeat, cold=True)
+    warm, _ = timed(fn, expr, repeat, cold=False)
+    return cold, warm, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10, help="runs per pattern; the best time is reported")
+    args = parser.parse_args()
+
+    print(f"{'':<31} {'──────── cold ────────':>26} {'──────── warm ────────':>26}")
+    print(f"{'Engine':<14} {'Expression':<16} {'SymPy ms':>9} {'Fast ms':>8} {'x':>7} {'SymPy ms':>9} {'Fast ms':>8} {'x':>7}")
+    print("-" * 85)
+    totals = [0.0, 0.0, 0.0, 0.0]
+    for engine, expr in PATTERNS:
+        fn = ENGINES[engine]
+        general_cold, general_warm, expected = run(fn, expr, args.repeat, fast=False)
+        fast_cold, fast_warm, result = run(fn, expr, args.repeat, fast=True)
+        assert result == expected, f"fast path changed the answer for {engine} {expr}: {result} != {expected}"
+        times = [general_cold, fast_cold, general_warm, fast_warm]
+        totals = [total + t for total, t in zip(totals, times)]
+        print(f"{engine:<14} {expr:<16} {general_cold * 1000:>9.2f} {fast_cold * 1000:>8.2f} "
+              f"{general_cold / fast_cold:>6.1f}x {general_warm * 1000:>9.2f} {fast_warm * 1000:>8.2f} "
+              f"{general_warm / fast_warm:>6.1f}x")
+    print("-" * 85)
+    print(f"{'Total':<31} {totals[0] * 1000:>9.2f} {totals[1] * 1000:>8.2f} {totals[0] / totals[1]:>6.1f}x "
+          f"{totals[2] * 1000:>9.2f} {totals[3] * 1000:>8.2f} {totals[2] / totals[3]:>6.1f}x")
+    app.CALCULUS_FAST_PATH = True
+
+
+if __name__ == '__main__':
+    main()
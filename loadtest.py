@@ -0,0 +1,333 @@
+"""Replay a mix of /api/chat and /api/solve traffic against a local server.
+
+    python loadtest.py --workers 2 --threads 4 --levels 1,4,16 --json sync-2x4.json
+    python loadtest.py --worker-class gthread --workers 4 --threads 8 --json gthread-4x8.json
+    python loadtest.py --url http://127.0.0.1:5000 --corpus slow_query.log
+    python loadtest.py --compare sync-2x4.json gthread-4x8.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# ─────────────────────────────────────────────────────────────
+# CORPUS
+# ─────────────────────────────────────────────────────────────
+
+# Variations of the route_query help examples; {a}, {b}, {n}, {k} and {data} are filled per request.
+CHAT_TEMPLATES = [
+    ("differentiate", "differentiate x^{n}+{a}x", 6),
+    ("differentiate", "differentiate sin({a}x)*x^{n}", 2),
+    ("integrate", "integrate x^{n}+{a}x", 4),
+    ("integrate", "integral of cos(x)", 2),
+    ("integrate", "integrate x^{n} from 0 to {b}", 2),
+    ("solve_equation", "solve x^2-{sq}=0", 5),
+    ("solve_equation", "{a}x+{b}={k}", 2),
+    ("factor", "factorise x^2-{s}x+{p}", 3),
+    ("simplify", "simplify (x+{a})^2-(x-{b})^2", 3),
+    ("statistics", "mean of [{data}]", 4),
+    ("statistics", "standard deviation of [{data}]", 3),
+    ("statistics", "median of {data}", 1),
+    ("function_points", "function points: {a} EI low, {b} ILF avg, 1 EO high, VAF={k}", 2),
+    ("cocomo", "COCOMO {k} KLOC organic", 2),
+    ("cocomo", "COCOMO {k} KLOC embedded", 1),
+    ("help", "hi", 1),
+]
+
+SOLVE_TEMPLATES = [
+    ("solve_equation", {"mode": "math", "equation": "x^2-{sq}=0"}, 4),
+    ("cocomo", {"mode": "cocomo", "kloc": "{k}", "cocomo_mode": "semi-detached"}, 2),
+    ("statistics", {"mode": "stat", "query": "{data}", "operation": "variance"}, 2),
+    ("function_points", {"mode": "fp", "components": [{"type": "EI", "complexity": "low", "count": "{a}"},
+                                                       {"type": "ILF", "complexity": "avg", "count": "{b}"}],
+                         "vaf_sum": "{k}"}, 2),
+]
+
+
+def _fill(value, rng):
+    # Wide enough ranges that a corpus has few repeated queries ({k} stays a valid VAF sum).
+    a, b = rng.randint(1, 99), rng.randint(1, 99)
+    params = {
+        "a": a, "b": b, "n": rng.randint(2, 12), "k": rng.randint(5, 60),
+        "sq": a * a, "s": a + b, "p": a * b,
+        "data": ", ".join(str(rng.randint(1, 1000)) for _ in range(rng.randint(5, 40))),
+    }
+
+    def fill(v):
+        if isinstance(v, str):
+            filled = v.format(**params)
+            return int(filled) if v.startswith("{") and filled.isdigit() else filled
+        if isinstance(v, dict):
+            return {key: fill(item) for key, item in v.items()}
+        if isinstance(v, list):
+            return [fill(item) for item in v]
+        return v
+    return fill(value)
+
+
+def synthetic_corpus(size, seed=0, solve_share=0.25):
+    rng = random.Random(seed)
+    chat_weights = [w for _, _, w in CHAT_TEMPLATES]
+    solve_weights = [w for _, _, w in SOLVE_TEMPLATES]
+    corpus = []
+    for _ in range(size):
+        if rng.random() < solve_share:
+            engine, body, _ = rng.choices(SOLVE_TEMPLATES, solve_weights)[0]
+            corpus.append({"endpoint": "/api/solve", "engine": engine, "body": _fill(body, rng)})
+        else:
+            engine, text, _ = rng.choices(CHAT_TEMPLATES, chat_weights)[0]
+            corpus.append({"endpoint": "/api/chat", "engine": engine, "body": {"message": _fill(text, rng)}})
+    return corpus
+
+
+def load_corpus(path):
+    # Accepts corpus lines or slow-query log records, both {"endpoint", "body", "engine", ...}. Records whose body
+    # was too large to log have "body": null and are skipped. Older records only kept "query": that is the whole
+    # body for a short /api/chat message, but /api/solve bodies cannot be rebuilt from it.
+    corpus = []
+    skipped = 0
+    with open(path, encoding='utf-8') as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            endpoint = entry.get("endpoint", "/api/chat")
+            body = entry.get("body")
+            query = entry.get("query", "")
+            if "body" not in entry and endpoint == "/api/chat" and len(query) < 500:
+                body = {"message": query}
+            if body is None:
+                skipped += 1
+                continue
+            corpus.append({"endpoint": endpoint, "engine": entry.get("engine", "unknown"), "body": body})
+    if skipped:
+        print(f"Skipped {skipped} records without a replayable request body", file=sys.stderr)
+    if not corpus:
+        raise SystemExit(f"No replayable requests in {path}")
+    return corpus
+
+# ─────────────────────────────────────────────────────────────
+# SERVER
+# ─────────────────────────────────────────────────────────────
+
+LIMIT_VARS = ('RATE_LIMIT_PER_SEC', 'RATE_LIMIT_BURST', 'ADMISSION_HEAVY_CONCURRENCY', 'ADMISSION_HEAVY_QUEUE',
+              'ADMISSION_LIGHT_CONCURRENCY', 'ADMISSION_LIGHT_QUEUE', 'ADMISSION_QUEUE_TIMEOUT')
+
+
+def start_server(args):
+    env = dict(os.environ)
+    if not args.keep_limits:
+        # The limiter and the admission gates would otherwise turn a load test into a test of themselves: no
+        # rate limit, every thread may run a heavy request, and queues long enough that nothing is shed.
+        # Variables already set in the environment are kept and end up in report["config"]["limits"].
+        env.setdefault('RATE_LIMIT_PER_SEC', '0')
+        for cls in ('HEAVY', 'LIGHT'):
+            env.setdefault(f'ADMISSION_{cls}_CONCURRENCY', str(args.threads))
+            env.setdefault(f'ADMISSION_{cls}_QUEUE', '100000')
+        env.setdefault('ADMISSION_QUEUE_TIMEOUT', str(args.timeout))
+    if not args.keep_cache:
+        # The corpus repeats every --size requests, so after warm-up nearly every symbolic query would be a hit
+        # in each worker's own simplify() cache, and configurations with more workers would warm up slower.
+        env.setdefault('SIMPLIFY_CACHE_SIZE', '0')
+    bind = f"127.0.0.1:{args.port}"
+    cmd = [sys.executable, "-m", "gunicorn", "app:app", "-b", bind, "-w", str(args.workers),
+           "--threads", str(args.threads), "-k", args.worker_class, "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    url = f"http://{bind}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"Server exited with code {proc.returncode}: {' '.join(cmd)}")
+        try:
+            urllib.request.urlopen(url + "/health", timeout=1).read()
+            return proc, url, {"limits": {name: env[name] for name in LIMIT_VARS if name in env},
+                               "simplify_cache_size": int(env.get('SIMPLIFY_CACHE_SIZE', 1024))}
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.25)
+    proc.terminate()
+    raise SystemExit("Server did not become healthy within 60s")
+
+# ─────────────────────────────────────────────────────────────
+# LOAD GENERATION & REPORTING
+# ─────────────────────────────────────────────────────────────
+
+def send(url, entry, timeout):
+    data = json.dumps(entry["body"]).encode()
+    req = urllib.request.Request(url + entry["endpoint"], data=data, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return entry["engine"], status, time.perf_counter() - start
+
+
+def run_level(url, corpus, concurrency, duration, timeout):
+    deadline = time.perf_counter() + duration
+    offsets = range(concurrency)
+
+    def client(offset):
+        results = []
+        i = offset
+        while time.perf_counter() < deadline:
+            results.append(send(url, corpus[i % len(corpus)], timeout))
+            i += concurrency
+        return results
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = [r for rs in pool.map(client, offsets) for r in rs]
+    return results, time.perf_counter() - start
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def _latency_summary(results):
+    # 503s are load shedding by the admission gates, counted apart from failures (other statuses, timeouts).
+    latencies = [lat * 1000 for _, status, lat in results if status == 200]
+    rejected = sum(1 for _, status, _ in results if status == 503)
+    errors = sum(1 for _, status, _ in results if status not in (200, 503))
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": errors / len(results) if results else 0.0,
+        "rejected_503": rejected,
+        "rejection_rate": rejected / len(results) if results else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def summarise_level(concurrency, results, elapsed):
+    by_engine = defaultdict(list)
+    statuses = defaultdict(int)
+    for r in results:
+        by_engine[r[0]].append(r)
+        statuses[str(r[1])] += 1
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(results) / elapsed if elapsed else 0.0,
+        "statuses": dict(statuses),
+        **_latency_summary(results),
+        "engines": {engine: _latency_summary(rs) for engine, rs in sorted(by_engine.items())},
+    }
+
+
+def _ms(value):
+    return f"{value:>8.1f}" if value is not None else f"{'-':>8}"
+
+
+def print_level(level):
+    print(f"\n── concurrency {level['concurrency']}: {level['throughput_rps']:.1f} req/s, "
+          f"{level['requests']} requests, error rate {level['error_rate']:.1%}, "
+          f"503 rate {level['rejection_rate']:.1%}, statuses {level['statuses']}")
+    print(f"{'Engine':<18} {'Count':>6} {'Err%':>6} {'503%':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    rows = list(level['engines'].items()) + [("ALL", level)]
+    for engine, s in rows:
+        print(f"{engine:<18} {s['requests']:>6} {s['error_rate']:>6.1%} {s['rejection_rate']:>6.1%} "
+              f"{_ms(s['p50_ms'])} {_ms(s['p95_ms'])} {_ms(s['p99_ms'])}")
+
+
+def compare(paths):
+    reports = []
+    for path in paths:
+        with open(path, encoding='utf-8') as fh:
+            reports.append(json.load(fh))
+    print(f"{'Concurrency':>11}  " + "  ".join(f"{r['config']['label'][:35]:>35}" for r in reports))
+    print(f"{'':>11}  " + "  ".join(f"{'req/s':>8} {'p95 ms':>8} {'err%':>8} {'503%':>8}" for _ in reports))
+    levels = sorted({lv['concurrency'] for r in reports for lv in r['levels']})
+    for c in levels:
+        cells = []
+        for r in reports:
+            lv = next((lv for lv in r['levels'] if lv['concurrency'] == c), None)
+            cells.append(f"{lv['throughput_rps']:>8.1f} {_ms(lv['p95_ms'])} {lv['error_rate']:>8.1%} "
+                         f"{lv.get('rejection_rate', 0.0):>8.1%}" if lv else f"{'-':>35}")
+        print(f"{c:>11}  " + "  ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the math engine API at increasing concurrency.")
+    parser.add_argument('--url', help="target an already running server instead of starting gunicorn")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--worker-class', default='sync', help="gunicorn worker class (sync, gthread, gevent, ...)")
+    parser.add_argument('--keep-limits', action='store_true',
+                        help="keep the server's rate limits and admission gates instead of raising them")
+    parser.add_argument('--keep-cache', action='store_true',
+                        help="keep the server's simplify() cache instead of turning it off")
+    parser.add_argument('--levels', default='1,2,4,8,16', help="comma-separated client concurrency levels")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument('--timeout', type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument('--corpus', help="JSONL corpus or slow-query log to replay")
+    parser.add_argument('--size', type=int, default=500, help="synthetic corpus size")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--record-corpus', metavar='OUT', help="write the corpus used to OUT and continue")
+    parser.add_argument('--label', help="name for this configuration in --json/--compare output")
+    parser.add_argument('--json', metavar='OUT', help="write the full report as JSON")
+    parser.add_argument('--compare', nargs='+', metavar='REPORT', help="compare earlier --json reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.compare)
+        return
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.size, args.seed)
+    if args.record_corpus:
+        with open(args.record_corpus, 'w', encoding='utf-8') as fh:
+            fh.writelines(json.dumps(entry) + "\n" for entry in corpus)
+
+    proc = None
+    server = {"limits": None, "simplify_cache_size": None}
+    url = args.url.rstrip('/') if args.url else None
+    if url is None:
+        proc, url, server = start_server(args)
+    label = args.label or (url if args.url else f"{args.worker_class} w={args.workers} t={args.threads}")
+    report = {
+        "config": {"label": label, "url": url, "workers": args.workers, "threads": args.threads,
+                   "worker_class": args.worker_class, "duration_s": args.duration,
+                   "corpus": args.corpus or f"synthetic:{args.size}:{args.seed}",
+                   **server, "keep_limits": args.keep_limits, "keep_cache": args.keep_cache},
+        "levels": [],
+    }
+    try:
+        print(f"Load test: {label} — {len(corpus)} corpus entries, {args.duration:.0f}s per level")
+        for c in [int(level) for level in args.levels.split(',') if level.strip()]:
+            results, elapsed = run_level(url, corpus, c, args.duration, args.timeout)
+            level = summarise_level(c, results, elapsed)
+            report["levels"].append(level)
+            print_level(level)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\nWrote report to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
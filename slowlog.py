@@ -0,0 +1,100 @@
+"""Summarise the slow-query log written by app.py (SLOW_QUERY_LOG).
+
+    python slowlog.py slow_query.log --top 10 --by engine
+    python slowlog.py slow_query.log --flame flame.folded
+"""
+import argparse
+import json
+import os
+from collections import Counter, defaultdict
+
+
+def read_records(path):
+    paths = [path]
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        paths.append(f"{path}.{i}")
+        i += 1
+    records = []
+    for p in reversed(paths):
+        if not os.path.exists(p):
+            continue
+        with open(p, encoding='utf-8') as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return records
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarise(records, by='query', top=10):
+    groups = defaultdict(list)
+    for r in records:
+        key = r.get('engine', 'none') if by == 'engine' else f"[{r.get('engine', 'none')}] {r.get('query', '')}"
+        groups[key].append(r)
+    rows = []
+    for key, rs in groups.items():
+        totals = [r['total_ms'] for r in rs]
+        rows.append({
+            "key": key,
+            "count": len(rs),
+            "total_ms": sum(totals),
+            "p50_ms": percentile(totals, 50),
+            "max_ms": max(totals),
+            "parse_ms": sum(r.get('parse_ms', 0) for r in rs) / len(rs),
+            "compute_ms": sum(r.get('compute_ms', 0) for r in rs) / len(rs),
+            "format_ms": sum(r.get('format_ms', 0) for r in rs) / len(rs),
+            "queue_ms": sum(r.get('queue_ms', 0) for r in rs) / len(rs),
+        })
+    rows.sort(key=lambda row: row['total_ms'], reverse=True)
+    return rows[:top]
+
+
+def merge_flames(records):
+    stacks = Counter()
+    for r in records:
+        for line in r.get('flame', []):
+            stack, _, count = line.rpartition(' ')
+            stacks[stack] += int(count)
+    return [f"{stack} {count}" for stack, count in stacks.most_common()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the top offenders in the slow-query log.")
+    parser.add_argument('path', nargs='?', default=os.environ.get('SLOW_QUERY_LOG', 'slow_query.log'))
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--by', choices=['query', 'engine'], default='query')
+    parser.add_argument('--flame', metavar='OUT', help="write merged folded stacks (flamegraph.pl / speedscope input)")
+    args = parser.parse_args()
+
+    records = read_records(args.path)
+    if not records:
+        print(f"No slow queries recorded in {args.path}")
+        return
+    print(f"{len(records)} slow requests in {args.path}\n")
+    print(f"{'Count':>6} {'Total ms':>10} {'p50 ms':>9} {'Max ms':>9} {'Parse':>8} {'Compute':>8} {'Format':>8} {'Queue':>8}  Offender")
+    print("-" * 109)
+    for row in summarise(records, args.by, args.top):
+        print(f"{row['count']:>6} {row['total_ms']:>10.1f} {row['p50_ms']:>9.1f} {row['max_ms']:>9.1f} "
+              f"{row['parse_ms']:>8.1f} {row['compute_ms']:>8.1f} {row['format_ms']:>8.1f} {row['queue_ms']:>8.1f}  {row['key'][:60]}")
+    if args.flame:
+        lines = merge_flames(records)
+        with open(args.flame, 'w', encoding='utf-8') as fh:
+            fh.write("\n".join(lines) + "\n")
+        print(f"\nWrote {len(lines)} folded stacks to {args.flame}")
+
+
+if __name__ == '__main__':
+    main()
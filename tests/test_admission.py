@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+import app
+from app import AdmissionGate, TokenBuckets
+
+
+def test_bucket_admits_burst_then_limits():
+    buckets = TokenBuckets(rate=1, burst=4)
+    assert [buckets.take("a", 1) for _ in range(4)] == [0, 0, 0, 0]
+    assert buckets.take("a", 1) == pytest.approx(1, abs=0.01)
+    assert buckets.take("b", 4) == 0
+    assert buckets.limited == 1
+
+
+def test_bucket_refund_restores_tokens():
+    buckets = TokenBuckets(rate=1, burst=4)
+    assert buckets.take("a", 4) == 0
+    buckets.refund("a", 4)
+    assert buckets.take("a", 4) == 0
+
+
+def test_bucket_off_when_rate_is_zero():
+    buckets = TokenBuckets(rate=0, burst=1)
+    assert all(buckets.take("a", 100) == 0 for _ in range(10))
+    assert not buckets.buckets
+
+
+def test_bucket_evicts_oldest_client():
+    buckets = TokenBuckets(rate=1, burst=1, max_clients=2)
+    for client in "abc":
+        buckets.take(client, 1)
+    assert list(buckets.buckets) == ["b", "c"]
+
+
+def test_gate_rejects_past_the_queue():
+    gate = AdmissionGate(concurrency=1, queue=0)
+    assert gate.acquire(1)
+    assert not gate.acquire(1)
+    gate.release()
+    assert gate.acquire(1)
+    assert gate.metrics()["admitted"] == 2 and gate.metrics()["rejected"] == 1
+
+
+def test_gate_queues_until_release():
+    gate = AdmissionGate(concurrency=1, queue=1)
+    assert gate.acquire(1)
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(gate.acquire(5)))
+    waiter.start()
+    while gate.metrics()["queue_depth"] == 0:
+        time.sleep(0.001)
+    assert not gate.acquire(0)
+    gate.release()
+    waiter.join()
+    assert admitted == [True]
+    assert not gate.acquire(0.01)
+    assert gate.metrics()["timed_out"] == 1
+
+
+def _new_session(client):
+    return client.post("/api/stats/session", json={"values": [1, 2, 3]})
+
+
+def test_route_returns_429_when_rate_limited(monkeypatch):
+    monkeypatch.setattr(app, "RATE_LIMITER", TokenBuckets(rate=1, burst=1))
+    client = app.app.test_client()
+    assert _new_session(client).status_code == 200
+    response = _new_session(client)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_route_refunds_tokens_on_503(monkeypatch):
+    limiter = TokenBuckets(rate=1, burst=2)
+    monkeypatch.setattr(app, "RATE_LIMITER", limiter)
+    monkeypatch.setattr(app, "ADMISSION_GATES", {"heavy": AdmissionGate(0, 0), "light": AdmissionGate(0, 0)})
+    client = app.app.test_client()
+    for _ in range(3):
+        response = _new_session(client)
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
+    [(tokens, _)] = limiter.buckets.values()
+    assert tokens == pytest.approx(2)
+    assert limiter.limited == 0
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+import app
+from app import estimate_complexity, safe_parse
+
+
+@pytest.mark.parametrize("expr, operation, decision", [
+    ("x^1000", "integrate", "exact"),
+    ("x^250", "simplify", "exact"),
+    ("x^300-1", "solve", "exact"),
+    ("3x^2+2x+1", "integrate", "exact"),
+    ("sin(x)*exp(x)", "integrate", "exact"),
+    ("1/(x^2+1)", "integrate", "exact"),
+    ("1/(x^3+x+1)", "integrate", "cheap"),
+    ("1/(x^4+x+1)", "integrate", "cheap"),
+    ("x^30+3x^7-x+2", "solve", "cheap"),
+    ("x^400+x^3+1", "solve", "cheap"),
+    ("x^5000+x+1", "solve", "reject"),
+    ("sin(x)*x^300", "integrate", "reject"),
+    ("sin(" * 30 + "x" + ")" * 30, "simplify", "reject"),
+])
+def test_decision(expr, operation, decision):
+    assert estimate_complexity(safe_parse(expr), operation)["decision"] == decision
+
+
+def test_rejection_names_the_limit():
+    result = app.engine_simplify("sin(" * 30 + "x" + ")" * 30)
+    assert "nesting depth 31" in result["error"]
+
+
+def test_large_equation_with_free_symbol_asks_for_values():
+    result = app.engine_solve_equation("x^30+a*x+1=0")
+    assert "numbers for a" in result["error"]
+
+
+def test_large_polynomial_is_solved_numerically():
+    roots = app.engine_solve_equation("x^40+3x^7-x+2=0")
+    assert "error" not in roots
+    assert roots["answer"].count(",") == 39
+
+
+def test_decision_log_records_outcome(monkeypatch, tmp_path):
+    records = []
+
+    class ListLogger:
+        def info(self, line):
+            records.append(json.loads(line))
+
+    monkeypatch.setattr(app, "COMPLEXITY_LOG", str(tmp_path / "complexity.jsonl"))
+    monkeypatch.setattr(app, "_get_complexity_logger", lambda: ListLogger())
+    app.engine_solve_equation("x^30+3x^7-x+2=0")
+    app.engine_solve_equation("x^30+a*x+1=0")
+    ok, error = records
+    assert (ok["op"], ok["decision"], ok["outcome"], ok["degree"]) == ("solve", "cheap", "ok", 30)
+    assert error["outcome"] == "error"
+    assert ok["strategy_ms"] >= 0 and ok["request_id"] is None
@@ -0,0 +1,43 @@
+import pytest
+
+import app
+from bench_fastpath import ENGINES, PATTERNS
+
+EXTRA_PATTERNS = [
+    ("differentiate", "x"),
+    ("differentiate", "7"),
+    ("differentiate", "x^(1/2)-3/x^2"),
+    ("differentiate", "-2sin(x/2)+exp(-x)"),
+    ("integrate", "1/x"),
+    ("integrate", "5"),
+    ("integrate", "x^(2/3)-4x^-3"),
+    ("integrate", "cos(x/3)-3/x"),
+    ("integrate", "-exp(-x)+x^7/2"),
+]
+
+
+def _both_ways(monkeypatch, engine, expr):
+    results = []
+    for fast in (False, True):
+        monkeypatch.setattr(app, "CALCULUS_FAST_PATH", fast)
+        app.simplify_cached.cache_clear()
+        results.append(ENGINES[engine](expr))
+    return results
+
+
+@pytest.mark.parametrize("engine, expr", PATTERNS + EXTRA_PATTERNS)
+def test_fast_path_matches_sympy(monkeypatch, engine, expr):
+    general, fast = _both_ways(monkeypatch, engine, expr)
+    assert "error" not in general
+    assert fast["answer"] == general["answer"]
+
+
+def test_fast_path_answers_high_degree_monomials():
+    assert app.engine_integrate("x^1000")["answer"] == "x**1001/1001"
+    assert app.engine_differentiate("x^1000")["answer"] == "1000*x**999"
+
+
+def test_fast_path_declines_products():
+    expr = app.safe_parse("x*sin(x)")
+    assert app.fast_antiderivative(expr, app.x) is None
+    assert app.fast_derivative(expr, app.x) is None
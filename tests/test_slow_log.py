@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+import app
+
+
+class ListLogger:
+    def __init__(self):
+        self.records = []
+
+    def info(self, line):
+        self.records.append(json.loads(line))
+
+
+@pytest.fixture
+def slow_log(monkeypatch, tmp_path):
+    logger = ListLogger()
+    monkeypatch.setattr(app, "SLOW_QUERY_LOG", str(tmp_path / "slow.jsonl"))
+    monkeypatch.setattr(app, "SLOW_QUERY_MS", 0)
+    monkeypatch.setattr(app, "_get_slow_logger", lambda: logger)
+    return logger.records
+
+
+def test_slow_request_is_recorded(slow_log):
+    client = app.app.test_client()
+    response = client.post("/api/solve", json={"mode": "stat", "query": "1, 2, 3, 4", "operation": "mean"})
+    assert response.status_code == 200
+    [record] = slow_log
+    assert record["endpoint"] == "/api/solve"
+    assert record["engine"] == "statistics"
+    assert record["query"] == "1, 2, 3, 4"
+    assert record["body"]["mode"] == "stat"
+    assert len(record["request_id"]) == 16
+    assert record["total_ms"] >= record["compute_ms"] >= 0
+
+
+def test_large_body_is_left_out(slow_log, monkeypatch):
+    monkeypatch.setattr(app, "SLOW_QUERY_BODY_MAX_BYTES", 100)
+    query = ", ".join(str(i) for i in range(1000))
+    app.app.test_client().post("/api/solve", json={"mode": "stat", "query": query, "operation": "mean"})
+    [record] = slow_log
+    assert record["body"] is None
+    assert record["body_bytes"] > 100
+    assert len(record["query"]) == 500
+
+
+def test_fast_request_is_not_recorded(slow_log, monkeypatch):
+    monkeypatch.setattr(app, "SLOW_QUERY_MS", 60000)
+    app.app.test_client().post("/api/solve", json={"mode": "stat", "query": "1, 2", "operation": "mean"})
+    assert slow_log == []
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+import app
+from app import QuantileSketch, StatsSession
+
+QUANTILES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+
+def test_sketch_quantiles_match_numpy():
+    data = np.random.default_rng(0).normal(50, 10, 20000)
+    sketch = QuantileSketch()
+    sketch.add(data.tolist())
+    spread = data.max() - data.min()
+    for q in QUANTILES:
+        assert sketch.quantile(q, data.min(), data.max()) == pytest.approx(np.percentile(data, q * 100),
+                                                                          abs=0.01 * spread)
+
+
+def test_sketch_merge_matches_single_sketch():
+    rng = np.random.default_rng(1)
+    parts = [rng.exponential(5, 5000), rng.normal(20, 2, 5000), rng.uniform(0, 40, 5000)]
+    merged = QuantileSketch()
+    for part in parts:
+        other = QuantileSketch()
+        other.add(part.tolist())
+        merged.merge(other)
+    data = np.concatenate(parts)
+    assert merged.total == len(data)
+    spread = data.max() - data.min()
+    for q in QUANTILES:
+        assert merged.quantile(q, data.min(), data.max()) == pytest.approx(np.percentile(data, q * 100),
+                                                                          abs=0.01 * spread)
+
+
+def test_session_merge_matches_numpy_moments():
+    rng = np.random.default_rng(2)
+    a, b = rng.normal(0, 1, 3000), rng.normal(5, 3, 2000)
+    left, right = StatsSession(), StatsSession()
+    left.append(a.tolist())
+    right.append(b.tolist())
+    summary = left.merge(right).summary()
+    data = np.concatenate([a, b])
+    assert summary["n"] == len(data)
+    assert summary["mean"] == pytest.approx(data.mean())
+    assert summary["variance"] == pytest.approx(data.var(ddof=1))
+    assert (summary["min"], summary["max"]) == (data.min(), data.max())
+
+
+def test_window_evicts_oldest_values():
+    data = np.random.default_rng(3).normal(0, 1, 1000)
+    session = StatsSession(window=100)
+    for start in range(0, len(data), 37):
+        session.append(data[start:start + 37].tolist())
+    last = data[-100:]
+    summary = session.summary(QUANTILES)
+    assert summary["n"] == 100
+    assert summary["mean"] == pytest.approx(last.mean())
+    assert summary["variance"] == pytest.approx(last.var(ddof=1))
+    assert (summary["min"], summary["max"]) == (last.min(), last.max())
+    for q in QUANTILES:
+        assert summary["quantiles"][str(q)] == pytest.approx(np.percentile(last, q * 100))
+
+
+def test_state_round_trip():
+    session = StatsSession()
+    session.append(list(range(1000)))
+    restored = StatsSession.from_dict(session.to_dict())
+    assert restored.summary() == session.summary()
+    windowed = StatsSession(window=10)
+    windowed.append(list(range(25)))
+    assert list(StatsSession.from_dict(windowed.to_dict()).values) == list(range(15, 25))
+
+
+@pytest.mark.parametrize("state", [
+    [],
+    {"n": -1},
+    {"n": 2, "mean": float("nan"), "sketch": {"centroids": [[1, 1], [2, 1]]}, "min": 1, "max": 2},
+    {"n": 1, "sketch": {"compression": 0, "centroids": [[1, 1]]}, "min": 1, "max": 1},
+    {"n": 1, "sketch": {"centroids": [[1, -1]]}, "min": 1, "max": 1},
+    {"n": 5, "sketch": {"centroids": [[1, 1]]}, "min": 1, "max": 1},
+    {"n": 2, "sketch": {"centroids": [[1, 1], [2, 1]]}, "min": 2, "max": 1},
+    {"window": 2, "values": [1, 2, 3]},
+])
+def test_from_dict_rejects_malformed_state(state):
+    with pytest.raises(ValueError):
+        StatsSession.from_dict(state)
+
+
+def test_append_caps_batch_size():
+    with pytest.raises(ValueError):
+        StatsSession().append([0] * (app.STATS_BATCH_MAX + 1))
+
+
+def test_create_returns_session_that_survives_eviction(monkeypatch):
+    monkeypatch.setattr(app, "STATS_SESSIONS_MAX", 1)
+    monkeypatch.setattr(app, "STATS_SESSIONS", app.OrderedDict())
+    first_id, first = app.stats_session_create()
+    second_id, _ = app.stats_session_create()
+    assert app.stats_session_get(first_id) is None
+    assert app.stats_session_get(second_id) is not None
+    first.append([1, 2, 3])
+    assert first.summary()["n"] == 3